@@ -1,50 +1,73 @@
 from flask import Flask, render_template, request, redirect, url_for, jsonify, session
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case, event, insert, inspect, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateIndex
 from werkzeug.utils import secure_filename
 import os
 import wikipedia
+import requests
+import aiohttp
 import fitz  # PyMuPDF
 import nltk
+import ahocorasick
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem import WordNetLemmatizer
 import re
 import logging
+import asyncio
+import atexit
+from collections import Counter, OrderedDict, defaultdict
+from functools import lru_cache
+from itertools import islice
 from datetime import datetime
-import hashlib
+import secrets
 from dotenv import load_dotenv
 
 
 import urllib.request
 import socket
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import threading
+import time
+
+# Last probe result, reused for NET_CHECK_TTL seconds so offline requests
+# don't each wait out the connection timeouts
+NET_CHECK_TTL = 30
+_net_cache = {'t': float('-inf'), 'v': False}
+_net_lock = threading.Lock()
 
 def check_internet_connection(timeout=3):
     """
     Fast & reliable internet check.
     Tries Google DNS first (port 53), then HTTP fallback.
+    The result is cached for NET_CHECK_TTL seconds.
     """
+    with _net_lock:
+        now = time.monotonic()
+        if now - _net_cache['t'] < NET_CHECK_TTL:
+            return _net_cache['v']
+        result = _probe_internet(timeout)
+        _net_cache.update(t=now, v=result)
+        return result
+
+def _probe_internet(timeout):
     try:
         # Method 1: Fast DNS ping (works even behind some firewalls)
-        socket.create_connection(("8.8.8.8", 53), timeout=timeout)
+        socket.create_connection(("8.8.8.8", 53), timeout=timeout).close()
         return True
     except OSError:
         pass
     
     try:
         # Method 2: HTTP request (more realistic)
-        urllib.request.urlopen("http://www.google.com", timeout=timeout)
-        return True
-    except:
+        with urllib.request.urlopen("http://www.google.com", timeout=timeout):
+            return True
+    except OSError:  # URLError, timeouts and resets are all OSErrors
         return False
-# Download NLTK data (quietly)
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    nltk.download('wordnet', quiet=True)
-    nltk.download('omw-1.4', quiet=True)
-except:
-    pass
-
 # Load environment variables from a .env file if present
 load_dotenv()
 
@@ -57,6 +80,7 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///ins
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'static/uploads')
 app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH_MB', '16')) * 1024 * 1024
+app.config['MAX_INGEST_CHARS'] = int(os.getenv('MAX_INGEST_CHARS', '200000'))
 
 # Ensure necessary directories exist
 os.makedirs('instance', exist_ok=True)
@@ -69,8 +93,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_pre_ping': True}
+if make_url(app.config['SQLALCHEMY_DATABASE_URI']).drivername in ('postgresql', 'postgresql+psycopg2'):
+    # Let psycopg2 send executemany() batches as multi-row VALUES
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['executemany_mode'] = 'values_plus_batch'
+
 db = SQLAlchemy(app)
 
+# WAL lets readers run alongside a writer, and synchronous=NORMAL skips the
+# per-commit fsync of the rollback journal (still safe against app crashes)
+SQLITE_PRAGMAS = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'mmap_size=268435456',
+    'temp_store=MEMORY',
+    'cache_size=-65536',
+)
+
+def _set_sqlite_pragmas(dbapi_conn, _):
+    cur = dbapi_conn.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cur.execute(f"PRAGMA {pragma}")
+    cur.close()
+
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', _set_sqlite_pragmas)
+
 # === DATABASE MODELS ===
 class Content(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -78,18 +127,31 @@ class Content(db.Model):
     content = db.Column(db.Text, nullable=False)
     category = db.Column(db.String(100))
     pdf_filename = db.Column(db.String(400))
-    pdf_text = db.Column(db.Text)
+    pdf_text = db.deferred(db.Column(db.Text))  # only searched via content_fts; load on access
     keywords = db.Column(db.Text)
     search_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_content_title_lower', db.func.lower(title)),
+        # title is already covered by its UNIQUE constraint's index
+        db.Index('ix_content_cat_created', 'category', 'created_at'),
+        db.Index('ix_content_created_at', 'created_at'),  # /library ordering
+        db.Index('ix_content_search_count', 'search_count'),
+    )
+
 class Conversation(db.Model):
+    # get_recent_context walks this index backwards and stops after `limit` rows
+    __table_args__ = (db.Index('ix_conv_session_created', 'session_id', 'created_at'),)
+
     id = db.Column(db.Integer, primary_key=True)
-    session_id = db.Column(db.String(100), nullable=False, index=True)
+    session_id = db.Column(db.String(100), nullable=False)
     user_query = db.Column(db.Text, nullable=False)
     bot_response = db.Column(db.Text, nullable=False)
     topic = db.Column(db.String(200))
+    core_topic = db.Column(db.String(200))  # bold title minus prefixes, see ConversationManager.core_topic
+    topic_is_african = db.Column(db.Boolean)  # topic passed validation; follow-ups on it skip re-checking
     intent = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -104,7 +166,7 @@ class UserFeedback(db.Model):
 class AfricanContentValidator:
     def __init__(self):
         # === 54 African Countries (official + common names/demonyms) ===
-        self.african_countries = {
+        self.african_countries = frozenset({
             # North Africa
             'algeria', 'egypt', 'libya', 'morocco', 'sudan', 'tunisia', 'western sahara',
             'algerian', 'egyptian', 'libyan', 'moroccan', 'sudanese', 'tunisian',
@@ -132,10 +194,10 @@ class AfricanContentValidator:
 
             # General
             'africa', 'african', 'pan-african', 'pan african'
-        }
+        })
 
         # === Major Cities & Towns (a strong signal of African content) ===
-        self.african_cities = {
+        self.african_cities = frozenset({
             'abidjan', 'accra', 'addis ababa', 'algiers', 'bamako', 'cape town', 'cairo', 'casablanca',
             'dakar', 'dar es salaam', 'douala', 'harare', 'ibadan', 'johannesburg', 'kampala', 'kano',
             'khartoum', 'kinshasa', 'lagos', 'luanda', 'lusaka', 'maputo', 'marrakech', 'mogadishu',
@@ -145,17 +207,17 @@ class AfricanContentValidator:
             'gaborone', 'kigali', 'libreville', 'lilongwe', 'lomé', 'mbabane', 'niamey', 'nouakchott',
             'port louis', 'tripoli', 'victoria', 'gitega', 'moroni', 'djibouti city', 'freetown',
             'maseru', 'mbuji-mayi', 'ndjamena', 'port elizabeth', 'port harcourt', 'port-gentil'
-        }
+        })
 
         # === Music Genres ===
-        self.african_music = {
+        self.african_music = frozenset({
             'afrobeats', 'afrobeat', 'amapiano', 'highlife', 'juju', 'fuji', 'makossa', 'soukous', 'rumba',
             'bongo flava', 'taarab', 'ndombolo', 'coupé-décalé', 'kizomba', 'kuduro', 'gqom', 'kwaito',
             'mbube', 'mbalax', 'marabi', 'mbaqanga', 'genge', 'kapuka', 'azonto', 'alkayida', 'sungura',
             'chimurenga', 'zouglou', 'bikutsi', 'zouk', 'funana', 'marrabenta', 'palm wine', 'palm-wine'
-        }
+        })
 
-        self.african_foods = {
+        self.african_foods = frozenset({
         # WEST AFRICA
         'jollof', 'jollof rice', 'waakye', 'fufu', 'banku', 'kenkey', 'garri', 'eba', 'pounded yam', 'amala',
         'egusi', 'egusi soup', 'ogbono soup', 'okro soup', 'okro', 'okrah', 'bitterleaf soup', 'edikaikong',
@@ -196,33 +258,33 @@ class AfricanContentValidator:
         'jerk chicken', 'ackee and saltfish', 'rice and peas', 'callaloo', 'cou cou', 'pepperpot', 'roti',
         'doubles', 'griot', 'tassot', 'diri ak djon djon', 'griot', 'pikliz', 'banane pesée', 'sancocho',
         'feijoada', 'moqueca', 'acarajé', 'vatapá', 'okra', 'gumbo', 'jambalaya', 'red red', 'ampesi'
-        }
+        })
 
         # === Clothing & Textiles ===
-        self.african_clothing = {
+        self.african_clothing = frozenset({
             'kente', 'ankara', 'dashiki', 'agbada', 'boubou', 'gele', 'aso oke', 'adire', 'kitenge',
             'bogolan', 'mudcloth', 'shweshwe', 'isiagu', 'kaftan', 'djellaba', 'gandoura', 'isi agu',
             'toghu', 'ndop', 'lappa', 'wrapper', 'headwrap', 'turbo', 'turban', 'senegalese boubou'
-        }
+        })
 
         # === Instruments ===
-        self.african_instruments = {
+        self.african_instruments = frozenset({
             'djembe', 'kora', 'balafon', 'talking drum', 'mbira', 'kalimba', 'ngoni', 'kpanlogo',
             'udu', 'shekere', 'gong', 'xylophone', 'thumb piano', 'seprewa', 'gyil', 'akoting',
             'valimba', 'marimba', 'sansa', 'likembe', 'bata', 'sabar', 'tama', 'fontomfrom', 'atumpan'
-        }
+        })
 
         # === Ethnic Groups & Languages (common mentions) ===
-        self.ethnic_and_languages = {
+        self.ethnic_and_languages = frozenset({
             'yoruba', 'igbo', 'hausa', 'fulani', 'akan', 'ashanti', 'zulu', 'xhosa', 'shona', 'amhara',
             'oromo', 'berber', 'tuareg', 'swahili', 'wolof', 'mandinka', 'bamileke', 'bantu', 'kikuyu',
             'luo', 'maasai', 'san', 'bushmen', 'khoisan', 'twi', 'fon', 'ewe', 'ga', 'dagomba', 'tigrinya',
             'somali', 'afrikaans', 'afrikaans', 'arabic', 'french', 'portuguese', 'amharic', 'somali',
             'berber', 'tamasheq', 'hassaniya', 'lingala', 'kikongo', 'tshiluba'
-        }
+        })
 
         # === Diaspora Icons & Movements ===
-        self.diaspora_figures = {
+        self.diaspora_figures = frozenset({
             # Civil Rights / Black Liberation
             'malcolm x', 'martin luther king', 'mlk', 'rosa parks', 'frederick douglass', 'harriet tubman',
             'marcus garvey', 'w.e.b. du bois', 'web du bois', 'booker t washington', 'huey newton',
@@ -242,22 +304,22 @@ class AfricanContentValidator:
             'philip emeagwali', 'wangari maathai', 'cheikh anta diop', 'ellen johnson sirleaf',
             'haile selassie', 'kwame nkrumah', 'jomo kenyatta', 'julius nyerere', 'nelson mandela',
             'desmond tutu', 'muhammad ali', 'serena williams', 'usain bolt', 'didier drogba'
-        }
+        })
 
         # === Cultural & Philosophical Concepts ===
-        self.cultural_concepts = {
+        self.cultural_concepts = frozenset({
             'ubuntu', 'sankofa', 'adinkra', 'griot', 'griotte', 'kwanzaa', 'harambee', 'ujamaa',
             'afrocentrism', 'pan-africanism', 'negritude', 'black consciousness', 'orisha', 'vodun',
             'hoodoo', 'rastafari', 'rastafarian', 'nyabinghi', 'garveyism', 'african renaissance',
             'nguzo saba', 'maafa', 'ase', 'ashe', 'orishas', 'ifa', 'candomble', 'santeria'
-        }
+        })
 
         # === Historical Events & Movements ===
-        self.historical_terms = {
+        self.historical_terms = frozenset({
             'transatlantic slave trade', 'middle passage', 'abolition', 'emancipation', 'jim crow',
             'apartheid', 'civil rights movement', 'black power', 'black panther party', 'cooperatives',
             'oja', 'market women', 'anc', 'swapo', 'zanu', 'mpls', 'frelimo', 'oa u', 'african union'
-        }
+        })
 
         # === Combine everything ===
         self.all_keywords = (
@@ -273,22 +335,14 @@ class AfricanContentValidator:
             self.historical_terms
         )
 
-        self.general_terms = {
+        self.general_terms = frozenset({
             'africa', 'african', 'afrika', 'black', 'afro', 'diaspora', 'heritage', 'culture',
             'tradition', 'traditional', 'ancestral', 'continental', 'pan-african', 'panafrican',
             'afropolitan', 'afrofuturism', 'afrobeats', 'afropolitan', 'black excellence',
             'melanin', 'woke', 'decolonize', 'reparations'
-        }
-
-    def is_african_query(self, text):
-        if not text: return False
-        text_lower = text.lower()
-        return any(k in text_lower for k in self.all_keywords) or any(t in text_lower for t in self.general_terms)
+        })
 
-    def get_query_category(self, text):
-        text_lower = text.lower()
-        categories = []
-        checks = [
+        self.category_checks = [
             ('country', self.african_countries),
             ('music', self.african_music),
             ('food', self.african_foods),
@@ -298,52 +352,114 @@ class AfricanContentValidator:
             ('culture', self.cultural_concepts),
             ('history', self.historical_terms),
         ]
-        for cat, words in checks:
-            if any(w in text_lower for w in words):
-                categories.append(cat)
-        return categories if categories else ['general']
+        self.category_order = {cat: i for i, (cat, _) in enumerate(self.category_checks)}
+
+        # Reverse index: keyword -> every category it belongs to
+        kw_to_cats = defaultdict(list)
+        for cat, words in self.category_checks:
+            for kw in words:
+                kw_to_cats[kw].append(cat)
+        self._kw_to_cats = {kw: tuple(cats) for kw, cats in kw_to_cats.items()}
+
+        # One Aho-Corasick automaton over every keyword: a single pass over the
+        # text finds all matches, which _kw_to_cats maps to categories (keywords
+        # like cities/general terms only mark relevance and have none).
+        self.automaton = ahocorasick.Automaton()
+        for kw in self.all_keywords | self.general_terms:
+            self.automaton.add_word(kw, kw)
+        self.automaton.make_automaton()
+
+    def is_african_query(self, text):
+        if not text: return False
+        return next(self.automaton.iter(text.lower()), None) is not None
+
+    def get_query_category(self, text):
+        text_lower = text.lower()
+        categories = {cat for _, kw in self.automaton.iter(text_lower) for cat in self._kw_to_cats.get(kw, ())}
+        return sorted(categories, key=self.category_order.get) if categories else ['general']
 
 validator = AfricanContentValidator()
 
+# chat_api checks the query, the combined search query and the topic on every
+# turn, often with strings seen on earlier turns. Only meant for short strings:
+# caching whole page texts would just pin them in memory.
+@lru_cache(maxsize=4096)
+def _is_african_cached(text_lower):
+    return validator.is_african_query(text_lower)
+
 # === TEXT PROCESSOR ===
+def _ensure_nltk(pkg, path):
+    """Download NLTK data (quietly) only if it isn't installed yet."""
+    try:
+        nltk.data.find(path)
+    except LookupError:
+        nltk.download(pkg, quiet=True)
+
+# Loaded once per process and shared by every TextPreprocessor
+@lru_cache(maxsize=None)
+def _load_stopwords():
+    try:
+        return frozenset(stopwords.words('english'))
+    except LookupError:
+        return frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'is'})
+
 class TextPreprocessor:
+    _NON_ALPHA_RE = re.compile(r'[^a-zA-Z\s]+')
+    _QUESTION_WORDS_RE = re.compile(
+        r'\b(?:you know|what|is|are|who|where|when|how|about|the|a|an|do|you|tell|me|give|names|of)\b'
+    )
+
     def __init__(self):
-        try:
-            self.stop_words = set(stopwords.words('english'))
-        except:
-            self.stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'is'}
+        _ensure_nltk('stopwords', 'corpora/stopwords')
+        _ensure_nltk('wordnet', 'corpora/wordnet')
+        self.stop_words = _load_stopwords()
         self.lemmatizer = WordNetLemmatizer()
 
-    def clean_text(self, text):
+    # Static so the cache key is just the text, not (self, text)
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def clean_text(text):
         if not text: return ""
-        text = text.lower()
-        text = re.sub(r'[^a-zA-Z\s]', '', text)
-        return ' '.join(text.split())
+        return ' '.join(TextPreprocessor._NON_ALPHA_RE.sub('', text.lower()).split())
 
-    def extract_main_keywords(self, text):
-        if not text: return []
-        text_lower = text.lower()
-        for word in ['what', 'is', 'are', 'who', 'where', 'when', 'how', 'about', 'the', 'a', 'an', 'do', 'you', 'tell', 'me', 'give', 'names', 'of', 'you know']:
-            text_lower = text_lower.replace(f' {word} ', ' ')
+    @staticmethod
+    def extract_main_keywords(text):
+        if not text: return ()
+        text_lower = TextPreprocessor._QUESTION_WORDS_RE.sub(' ', text.lower())
         words = [w.strip() for w in text_lower.split() if len(w.strip()) > 2]
-        return words[:5]  # Limit to top 5
+        return tuple(words[:5])  # Limit to top 5; tuple so cached results can't be mutated
+
+    # Queries repeat across turns and across search/response building in one turn.
+    # Document text never repeats and would only pin pages in memory, so pages and
+    # uploads call extract_main_keywords directly.
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def query_keywords(query):
+        return TextPreprocessor.extract_main_keywords(query)
 
 text_processor = TextPreprocessor()
 
 # === INTENT DETECTOR ===
 class IntentDetector:
+    def __init__(self):
+        # Checked in priority order; plain substring matches, as before
+        intents = [
+            ('recipe', ['recipe', 'cook', 'prepare', 'make', 'ingredients', 'how to']),
+            ('history', ['history', 'origin', 'started', 'began']),
+            ('definition', ['what is', 'define', 'meaning', 'symbolize', 'represent', 'stand for']),
+            ('cultural', ['significance', 'important', 'why', 'cultural', 'tradition']),
+            ('comparison', ['difference', 'compare', 'vs', 'versus', 'which country', 'best']),
+        ]
+        self._patterns = [
+            (name, re.compile('|'.join(map(re.escape, words))))
+            for name, words in intents
+        ]
+
     def detect_intent(self, query):
         q = query.lower()
-        if any(x in q for x in ['recipe', 'cook', 'prepare', 'make', 'ingredients', 'how to']):
-            return 'recipe'
-        if any(x in q for x in ['history', 'origin', 'started', 'began']):
-            return 'history'
-        if any(x in q for x in ['what is', 'define', 'meaning', 'symbolize', 'represent', 'stand for']):
-            return 'definition'
-        if any(x in q for x in ['significance', 'important', 'why', 'cultural', 'tradition']):
-            return 'cultural'
-        if any(x in q for x in ['difference', 'compare', 'vs', 'versus', 'which country', 'best']):
-            return 'comparison'
+        for name, pattern in self._patterns:
+            if pattern.search(q):
+                return name
         return 'general'
 
 intent_detector = IntentDetector()
@@ -352,7 +468,7 @@ intent_detector = IntentDetector()
 class ConversationManager:
     def get_session_id(self):
         if 'session_id' not in session:
-            session['session_id'] = hashlib.md5(str(datetime.utcnow()).encode()).hexdigest()
+            session['session_id'] = secrets.token_hex(16)
         return session['session_id']
 
     def get_recent_context(self, session_id, limit=7):
@@ -360,26 +476,63 @@ class ConversationManager:
             .order_by(Conversation.created_at.desc()).limit(limit).all()
         return list(reversed(conversations))
 
-    def save_conversation(self, user_query, bot_response, topic, intent):
+    def save_conversation(self, user_query, bot_response, topic, intent, topic_is_african=False):
         session_id = self.get_session_id()
         conv = Conversation(
             session_id=session_id,
             user_query=user_query,
             bot_response=bot_response,
             topic=topic,
+            core_topic=self.core_topic(bot_response),
+            topic_is_african=topic_is_african,
             intent=intent
         )
         db.session.add(conv)
         db.session.commit()
 
+    # Text between the first pair of '**' (or to the end if unclosed)
+    _BOLD_TITLE_RE = re.compile(r'\*\*(.*?)(?:\*\*|\Z)', re.S)
+    # Common prefixes/suffixes around the core subject of a bold title
+    _TITLE_STRIP_RE = re.compile(
+        r'^(?:death and state funeral of |history of |biography of |origin of |story of |life of |legacy of )'
+        r'|(?: recipe| history| biography)$'
+    )
+
+    def core_topic(self, bot_response):
+        """Core subject of a reply's bold title, or None if it has none.
+
+        "Death and state funeral of Nelson Mandela" → "Nelson Mandela"
+        "History of Jollof Rice" → "Jollof Rice"
+        """
+        match = self._BOLD_TITLE_RE.search(bot_response)
+        if match:
+            extracted = match.group(1).strip()
+            if len(extracted) > 2:
+                return self._TITLE_STRIP_RE.sub('', extracted.lower()).strip().title()
+        return None
+
+    # Whole words only, so 'it' doesn't match inside 'item' or 'sit'
+    _FOLLOWUP_RE = re.compile(
+        r'\b(?:it|that|this|them|they|he|she|him|her|his|their|also|too|and|so|but|'
+        r'yes|yeah|exactly|continue|another|next|more|what else|what about|how about|details?|story|'
+        r'biography|life|early life|childhood|education|career|achievements)\b',
+        re.I
+    )
+
+    def follow_up_signals(self, query):
+        """One scan, two answers: (continues, refines).
+
+        continues: the query stays on the previous topic, because it has a
+        follow-up cue or is short (10 words or fewer), e.g. "what about the museum?".
+        refines: it has a cue and is short enough (12 words or fewer) for that
+        topic to be joined into the search query.
+        """
+        has_cue = bool(self._FOLLOWUP_RE.search(query))
+        words = len(query.split())
+        return has_cue or words <= 10, has_cue and words <= 12
+
     def is_follow_up_question(self, query):
-        q = query.lower()
-        strong_indicators = [
-            'it', 'that', 'this', 'them', 'they', 'he', 'she', 'him', 'her',
-            'also', 'too', 'more about', 'tell me more', 'what else', 'and',
-            'yes', 'yeah', 'exactly', 'continue', 'another', 'next'
-        ]
-        return any(ind in q for ind in strong_indicators) and len(q.split()) <= 12
+        return self.follow_up_signals(query)[1]
 
     def is_follow_up(self, query, recent_context):
         if not recent_context:
@@ -390,7 +543,7 @@ class ConversationManager:
         return self.is_follow_up_question(query)
 
     def extract_topic(self, query, response):
-        keywords = text_processor.extract_main_keywords(query)
+        keywords = text_processor.query_keywords(query)
         if keywords:
             return ' '.join(keywords).title()
         if '**' in response:
@@ -398,64 +551,250 @@ class ConversationManager:
             return title.strip()
         return 'General'
 
-    def save_exchange(self, session_id, user_query, bot_response, topic):
+    def save_exchange(self, session_id, user_query, bot_response, topic, topic_is_african=False):
         intent = intent_detector.detect_intent(user_query)
-        self.save_conversation(user_query, bot_response, topic, intent)
+        self.save_conversation(user_query, bot_response, topic, intent, topic_is_african)
 
 conversation_manager = ConversationManager()
 
 # === SMART SEARCH ENGINE ===
 class AfricanSearchEngine:
+    # External-content FTS5 index over the content table. The triggers keep it in
+    # sync with writes, one row at a time, so inserts never need a full rebuild;
+    # updates only re-index when an indexed column changes, so search_count
+    # bumps don't rewrite the document.
+    FTS_SCHEMA = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(
+            title, content, pdf_text, keywords, content='content', content_rowid='id'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS content_fts_ai AFTER INSERT ON content BEGIN
+            INSERT INTO content_fts(rowid, title, content, pdf_text, keywords)
+            VALUES (new.id, new.title, new.content, new.pdf_text, new.keywords);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS content_fts_ad AFTER DELETE ON content BEGIN
+            INSERT INTO content_fts(content_fts, rowid, title, content, pdf_text, keywords)
+            VALUES ('delete', old.id, old.title, old.content, old.pdf_text, old.keywords);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS content_fts_au
+        AFTER UPDATE OF title, content, pdf_text, keywords ON content BEGIN
+            INSERT INTO content_fts(content_fts, rowid, title, content, pdf_text, keywords)
+            VALUES ('delete', old.id, old.title, old.content, old.pdf_text, old.keywords);
+            INSERT INTO content_fts(rowid, title, content, pdf_text, keywords)
+            VALUES (new.id, new.title, new.content, new.pdf_text, new.keywords);
+        END""",
+    ]
+
+    # Intent bonuses are FTS lookups too, so they never scan document text
+    INTENT_BONUS_QUERIES = {
+        'recipe': 'recipe*',
+        'comparison': 'vs OR compare* OR difference*',
+    }
+
+    # Terms behind the same bonuses for databases without FTS5
+    INTENT_BONUS_TERMS = {
+        'recipe': ('recipe',),
+        'comparison': ('vs', 'compare', 'difference'),
+    }
+
+    # search_count bumps are buffered and written in one executemany
+    SEARCH_COUNT_FLUSH_EVERY = 20
+
     def __init__(self):
-        self.data = []
-
-    def index_content(self):
-        contents = Content.query.all()
-        self.data = [{
-            'id': c.id,
-            'title': c.title,
-            'title_lower': c.title.lower(),
-            'content': c.content,
-            'full_text': f"{c.title} {c.content} {c.pdf_text or ''}".lower(),
-            'keywords': (c.keywords or '').lower()
-        } for c in contents]
-        logger.info(f"Indexed {len(self.data)} items")
+        self._pending_counts = Counter()
+        self._pending_lock = threading.Lock()
+
+    def index_content(self, rebuild=True):
+        """Create the FTS index if needed and rebuild it from the content table.
+
+        With rebuild=False an existing index is left alone: the triggers have
+        kept it in step with every write since it was created.
+        """
+        if not self.uses_fts():
+            logger.info("FTS5 needs SQLite; searching with plain LIKE queries")
+            return
+        created = not inspect(db.engine).has_table('content_fts')
+        for ddl in self.FTS_SCHEMA:
+            db.session.execute(text(ddl))
+        if rebuild or created:
+            db.session.execute(text("INSERT INTO content_fts(content_fts) VALUES ('rebuild')"))
+        db.session.commit()
+        if rebuild or created:
+            count = db.session.execute(text("SELECT count(*) FROM content")).scalar()
+            logger.info(f"Indexed {count} items")
+
+    @staticmethod
+    def uses_fts():
+        return db.engine.dialect.name == 'sqlite'
 
     def search(self, query, intent='general', limit=10):
-        if not self.data:
-            self.index_content()
+        """Rank content for a query; only the top hit carries its full content."""
         query_lower = query.lower()
-        keywords = text_processor.extract_main_keywords(query)
-        results = []
-
-        for item in self.data:
-            score = 0.0
-            if query_lower in item['title_lower'] or item['title_lower'] in query_lower:
-                score += 50
-            score += sum(20 for kw in keywords if kw in item['title_lower'])
-            score += sum(2 for kw in keywords if kw in item['full_text'])
-            if intent == 'recipe' and 'recipe' in item['full_text']:
-                score += 15
-            if intent == 'comparison' and any(w in item['full_text'] for w in ['vs', 'compare', 'difference']):
-                score += 15
-            if score > 10:
-                results.append({**item, 'relevance_score': score})
-
-        results.sort(key=lambda x: x['relevance_score'], reverse=True)
+        keywords = text_processor.query_keywords(query)
+        tokens = [t for kw in keywords for t in re.findall(r'\w+', kw)]
+        if not tokens:
+            return []
+
+        if self.uses_fts():
+            results = self._search_fts(query_lower, keywords, tokens, intent, limit)
+        else:
+            results = self._search_portable(query_lower, keywords, tokens, intent, limit)
 
         if results:
-            top = Content.query.get(results[0]['id'])
-            if top:
-                top.search_count += 1
-                db.session.commit()
+            # Documents can be up to 100k chars; only the best one is used to answer
+            results[0]['content'] = db.session.execute(
+                select(Content.content).where(Content.id == results[0]['id'])
+            ).scalar()
+            with self._pending_lock:
+                self._pending_counts[results[0]['id']] += 1
+                due = sum(self._pending_counts.values()) >= self.SEARCH_COUNT_FLUSH_EVERY
+            if due:
+                self.flush_search_counts()
+
+        return results
+
+    def _search_fts(self, query_lower, keywords, tokens, intent, limit):
+        params = {
+            'match': ' OR '.join(f'"{t}"' for t in tokens),
+            'query': query_lower,
+            'limit': limit,
+        }
+        # Title hits are scored the same way as before: +50 when the query and
+        # title contain each other, +20 per keyword found in the title.
+        title_bonus = []
+        for i, kw in enumerate(keywords):
+            params[f'kw{i}'] = kw
+            title_bonus.append(f"CASE WHEN instr(lower(c.title), :kw{i}) > 0 THEN 20 ELSE 0 END")
+        intent_bonus = "0"
+        if intent in self.INTENT_BONUS_QUERIES:
+            params['intent_match'] = self.INTENT_BONUS_QUERIES[intent]
+            intent_bonus = ("CASE WHEN c.id IN (SELECT rowid FROM content_fts "
+                            "WHERE content_fts MATCH :intent_match) THEN 15 ELSE 0 END")
+
+        sql = f"""
+            SELECT * FROM (
+                SELECT c.id, c.title, c.keywords,
+                       -bm25(content_fts, 5.0, 1.0, 1.0, 2.0)
+                       + CASE WHEN instr(:query, lower(c.title)) > 0
+                                OR instr(lower(c.title), :query) > 0 THEN 50 ELSE 0 END
+                       + {' + '.join(title_bonus)}
+                       + {intent_bonus} AS relevance_score
+                FROM content_fts
+                JOIN content c ON c.id = content_fts.rowid
+                WHERE content_fts MATCH :match
+            )
+            WHERE relevance_score > 10
+            ORDER BY relevance_score DESC
+            LIMIT :limit
+        """
+        return [dict(row._mapping) for row in db.session.execute(text(sql), params)]
 
-        return results[:limit]
+    def _search_portable(self, query_lower, keywords, tokens, intent, limit):
+        """LIKE-based ranking for databases without FTS5, e.g. Postgres.
+
+        Same title and intent bonuses as _search_fts; bm25 is replaced by +10
+        per token found in the keywords and +5 per token found in the text.
+        """
+        title = db.func.lower(Content.title)
+        kw_col = db.func.lower(db.func.coalesce(Content.keywords, ''))
+        body = db.func.lower(Content.content + ' ' + db.func.coalesce(Content.pdf_text, ''))
+
+        score = case((db.literal(query_lower).contains(title) | title.contains(query_lower), 50), else_=0)
+        for kw in keywords:
+            score = score + case((title.contains(kw), 20), else_=0)
+        for t in tokens:
+            score = score + case((kw_col.contains(t), 10), else_=0) + case((body.contains(t), 5), else_=0)
+        terms = self.INTENT_BONUS_TERMS.get(intent)
+        if terms:
+            score = score + case((db.or_(*(body.contains(t) for t in terms)), 15), else_=0)
+
+        matches = db.or_(*(col.contains(t) for t in tokens for col in (title, kw_col, body)))
+        scored = (
+            select(Content.id, Content.title, Content.keywords, score.label('relevance_score'))
+            .where(matches)
+            .subquery()
+        )
+        stmt = (
+            select(scored)
+            .where(scored.c.relevance_score > 10)
+            .order_by(scored.c.relevance_score.desc())
+            .limit(limit)
+        )
+        return [dict(row._mapping) for row in db.session.execute(stmt)]
+
+    def flush_search_counts(self):
+        """Write buffered search_count increments in a single statement."""
+        with self._pending_lock:
+            pending, self._pending_counts = self._pending_counts, Counter()
+        if not pending:
+            return
+        db.session.execute(
+            text("UPDATE content SET search_count = coalesce(search_count, 0) + :n WHERE id = :id"),
+            [{'id': content_id, 'n': n} for content_id, n in pending.items()]
+        )
+        db.session.commit()
 
 search_engine = AfricanSearchEngine()
 
 # === RESPONSE GENERATOR (IMPROVED FOR DEEPER RESPONSES) ===
+
 class ResponseGenerator:
+    _SENT_RE = re.compile(r'(?<=[.!?])\s+')
+    _HEADER_RE = re.compile(r'\n(?:==+\s*)(.*?)(?:\s*==+)\n')
+
+    # Common section patterns
+    SECTION_PATTERNS = {
+        'education': ['education', 'school', 'university', 'study', 'degree', 'college', 'learning'],
+        'museum': ['museum', 'memorial', 'foundation', 'centre of memory', 'exhibit'],
+        'family': ['family', 'wife', 'children', 'marriage', 'married', 'son', 'daughter'],
+        'death': ['death', 'died', 'funeral', 'passed away', 'illness'],
+        'prison': ['prison', 'imprisonment', 'robben island', 'jail', 'incarcerated'],
+        'childhood': ['childhood', 'born', 'early life', 'youth', 'growing up'],
+        'legacy': ['legacy', 'honours', 'awards', 'recognition', 'impact'],
+        'presidency': ['president', 'presidency', 'administration', 'government'],
+    }
+    _SECTION_RES = {
+        section: re.compile('|'.join(map(re.escape, kws)))
+        for section, kws in SECTION_PATTERNS.items()
+    }
+    # One anchored match: the alternatives are tried in SECTION_PATTERNS order and
+    # each lookahead scans the whole query, so the first section (not the
+    # leftmost keyword) wins, and lastgroup names it.
+    _SECTION_DETECTOR = re.compile(
+        '(?s)(?:' + '|'.join(
+            f'(?=.*?(?:{pattern.pattern}))(?P<{section}>)'
+            for section, pattern in _SECTION_RES.items()
+        ) + ')'
+    )
+
+    # Replies to new questions depend only on the top document and the intent,
+    # so they are shared across sessions; bounded since there is no eviction by age
+    REPLY_CACHE_SIZE = 512
+
+    def __init__(self):
+        self._reply_cache = OrderedDict()  # (content id, intent) -> response, LRU order
+        self._reply_lock = threading.Lock()
+
     def generate_response(self, query, search_results, intent, is_followup=False, current_topic=None):
+        # Follow-up answers are built from the query's own keywords and wording, so
+        # near-identical queries ("his wife" / "his life") need different answers
+        if not search_results or (is_followup and current_topic):
+            return self._build_response(query, search_results, intent, is_followup, current_topic)
+
+        key = (search_results[0]['id'], intent)
+        with self._reply_lock:
+            resp = self._reply_cache.get(key)
+            if resp is not None:
+                self._reply_cache.move_to_end(key)
+                return resp
+
+        resp = self._build_response(query, search_results, intent, is_followup, current_topic)
+        with self._reply_lock:
+            self._reply_cache[key] = resp
+            if len(self._reply_cache) > self.REPLY_CACHE_SIZE:
+                self._reply_cache.popitem(last=False)
+        return resp
+
+    def _build_response(self, query, search_results, intent, is_followup, current_topic):
         if not search_results:
             return self.generate_fallback_response(query, intent)
 
@@ -468,7 +807,7 @@ class ResponseGenerator:
         # =================================================================
         if is_followup and current_topic:
             # Extract query keywords (what they're asking about)
-            query_keywords = text_processor.extract_main_keywords(query)
+            query_keywords = text_processor.query_keywords(query)
             
             # Try to find relevant section
             relevant_section = self._extract_relevant_section(content, query_keywords, query)
@@ -519,45 +858,31 @@ class ResponseGenerator:
         """
         query_lower = query.lower()
         
-        # Common section patterns
-        section_patterns = {
-            'education': ['education', 'school', 'university', 'study', 'degree', 'college', 'learning'],
-            'museum': ['museum', 'memorial', 'foundation', 'centre of memory', 'exhibit'],
-            'family': ['family', 'wife', 'children', 'marriage', 'married', 'son', 'daughter'],
-            'death': ['death', 'died', 'funeral', 'passed away', 'illness'],
-            'prison': ['prison', 'imprisonment', 'robben island', 'jail', 'incarcerated'],
-            'childhood': ['childhood', 'born', 'early life', 'youth', 'growing up'],
-            'legacy': ['legacy', 'honours', 'awards', 'recognition', 'impact'],
-            'presidency': ['president', 'presidency', 'administration', 'government'],
-        }
-        
         # Determine what section user wants
-        target_section = None
-        for section, section_keywords in section_patterns.items():
-            if any(kw in query_lower for kw in section_keywords):
-                target_section = section
-                break
+        match = self._SECTION_DETECTOR.match(query_lower)
+        target_section = match.lastgroup if match else None
         
         if not target_section:
             # Try using query keywords directly
             return self._extract_section(text, keywords)
         
         # Split content by section headers (== Header ==)
-        sections = re.split(r'\n(?:==+\s*)(.*?)(?:\s*==+)\n', text)
+        sections = self._HEADER_RE.split(text)
         
         # Find matching section
+        header_re = self._SECTION_RES[target_section]
         for i in range(1, len(sections), 2):  # Odd indices are headers
             if i < len(sections) - 1:
                 header = sections[i].lower()
                 section_content = sections[i + 1]
                 
                 # Check if header matches what user wants
-                if any(kw in header for kw in section_patterns.get(target_section, [])):
+                if header_re.search(header):
                     # Return first 600 chars of section
                     return section_content.strip()[:600] + "..."
         
         # Fallback: search content for relevant paragraphs
-        return self._extract_section(text, section_patterns.get(target_section, keywords))
+        return self._extract_section(text, self.SECTION_PATTERNS[target_section])
 
     def _generate_contextual_followup(self, query, title, content, topic):
         """
@@ -574,7 +899,7 @@ class ResponseGenerator:
             return f"Here's more about **{topic}**:\n\n{content[800:1600]}...\n\nWhat specific aspect interests you?"
         
         # Default: provide a focused snippet
-        keywords = text_processor.extract_main_keywords(query)
+        keywords = text_processor.query_keywords(query)
         section = self._extract_section(content, keywords)
         
         if section:
@@ -587,18 +912,8 @@ class ResponseGenerator:
         if not keywords:
             return None
             
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        extracted = []
-        
-        for sent in sentences:
-            sent_lower = sent.lower()
-            # More flexible matching
-            if any(k.lower() in sent_lower for k in keywords):
-                extracted.append(sent)
-                
-                # Stop after getting enough content (3-5 sentences)
-                if len(extracted) >= 5:
-                    break
+        # Stop after getting enough content (3-5 sentences)
+        extracted = self._matching_sentences(text, keywords, limit=5)
         
         result = ' '.join(extracted)
         
@@ -612,6 +927,52 @@ class ResponseGenerator:
             
         return result if result else None
 
+    def _matching_sentences(self, text, keywords, limit):
+        """
+        First `limit` sentences containing any keyword (case-insensitive).
+        Jumps from one keyword hit to the next with str.find and only locates
+        the sentence boundaries around each hit, instead of splitting the
+        whole document up front.
+        """
+        text_lower = text.lower()
+        kws = [k.lower() for k in keywords]
+
+        if len(text_lower) != len(text):
+            # Some characters change length when lowercased, so offsets into
+            # text_lower wouldn't line up with text; split the slow way.
+            sentences = (s for s in self._SENT_RE.split(text) if any(k in s.lower() for k in kws))
+            return list(islice(sentences, limit))
+
+        next_hit = {k: text_lower.find(k) for k in kws}
+        extracted = []
+        pos = 0  # always the start of a sentence
+        while len(extracted) < limit:
+            for k, hit in next_hit.items():
+                if 0 <= hit < pos:
+                    next_hit[k] = text_lower.find(k, pos)
+            hits = [(hit, k) for k, hit in next_hit.items() if hit >= 0]
+            if not hits:
+                break
+            hit, k = min(hits)
+
+            start, end = pos, None
+            for boundary in self._SENT_RE.finditer(text, pos):
+                if boundary.end() > hit:
+                    end = boundary
+                    break
+                start = boundary.end()
+            stop = end.start() if end else len(text)
+            if hit + len(k) > stop:
+                # Match runs across a sentence break; it isn't in any one sentence
+                next_hit[k] = text_lower.find(k, hit + 1)
+                continue
+            extracted.append(text[start:stop])
+            if not end:
+                break
+            pos = end.end()
+
+        return extracted
+
     def generate_fallback_response(self, query, intent):
         suggestions = {
             'recipe': ['Jollof rice', 'Fufu', 'Egusi soup', 'Suya'],
@@ -625,67 +986,140 @@ class ResponseGenerator:
 response_generator = ResponseGenerator()
 
 # === ONLINE SEARCH (UPDATED FOR DEEPER CONTENT) ===
+class _WikiSession(requests.Session):
+    """Keep-alive session for Wikipedia calls, with a default timeout."""
+    def request(self, *args, **kwargs):
+        kwargs.setdefault('timeout', 10)
+        return super().request(*args, **kwargs)
+
+# The wikipedia package calls requests.get() for every API request, each on a new
+# TCP/TLS connection. Route those calls through one pooled session instead.
+WIKI_USER_AGENT = 'AfricaChat/1.0'
+_WIKI_SESSION = _WikiSession()
+# Our own REST calls (fetch_summary_fast) send this; set_user_agent only covers the package's
+_WIKI_SESSION.headers.update({'User-Agent': WIKI_USER_AGENT})
+wikipedia.wikipedia.requests = _WIKI_SESSION
+wikipedia.set_user_agent(WIKI_USER_AGENT)
+
+# What a Wikipedia lookup can reasonably fail with; anything else is a bug and propagates.
+# The wikipedia package raises KeyError on some malformed API responses.
+_WIKI_ERRORS = (wikipedia.exceptions.WikipediaException, requests.RequestException, KeyError, SQLAlchemyError)
+
+WIKI_SUMMARY_URL = "https://en.wikipedia.org/api/rest_v1/page/summary/{}"
+
+# Learning a page (full-text fetch + insert) runs here, off the request thread
+_LEARN_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='learn')
+
+def fetch_summary_fast(title):
+    """Title and lead extract of a page in a single REST call, or None."""
+    resp = _WIKI_SESSION.get(WIKI_SUMMARY_URL.format(quote(title.replace(' ', '_'), safe='')))
+    if resp.status_code != 200:
+        return None
+    return resp.json()
+
+def _summary_title(summary, fallback):
+    """Plain-text page title from a REST summary (its 'displaytitle' may hold HTML)."""
+    return summary.get('titles', {}).get('normalized') or summary.get('title') or fallback
+
+def persist_and_index(title):
+    """Fetch a page's full content and add it to the library (runs on _LEARN_POOL)."""
+    with app.app_context():
+        try:
+            page = wikipedia.page(title, auto_suggest=False)
+            if db.session.query(Content.id).filter_by(title=page.title).scalar():
+                return
+            body = page.content[:100000]  # bounded once; stored and analysed as-is
+            full = f"{page.title} {body}"
+            cats = validator.get_query_category(full)
+            keywords = ' '.join(text_processor.extract_main_keywords(full))
+
+            # Core insert: the 100k-char body never passes through the identity map
+            db.session.execute(insert(Content), [{
+                'title': page.title,
+                'content': body,
+                'category': cats[0] if cats else 'general',
+                'keywords': keywords
+            }])
+            db.session.commit()  # content_fts triggers index the new row
+            logger.info(f"Learned full: {page.title}")
+        except _WIKI_ERRORS as e:  # includes IntegrityError when another request learned it first
+            db.session.rollback()
+            logger.warning(f"Could not learn {title}: {e}")
+        except Exception:
+            # Last stop on a pool thread: nothing reads the Future, so keep the traceback here
+            db.session.rollback()
+            logger.exception(f"Unexpected error learning {title}")
+            raise
+
 def search_african_content_online(query):
     if not check_internet_connection():
         return None
 
     try:
         results = wikipedia.search(query, results=10)
+        # One lookup for every candidate, so known pages are skipped before fetching them
+        existing = {t for (t,) in db.session.query(Content.title).filter(Content.title.in_(results))}
         for title in results:
+            if title in existing:
+                continue
             try:
-                page = wikipedia.page(title, auto_suggest=False)
-                full_content = page.content  # Full content for deeper info
-                full = f"{title} {full_content}"
-
-                if not validator.is_african_query(full):
+                summary = fetch_summary_fast(title)
+                if not summary:
                     continue
-
-                if Content.query.filter_by(title=page.title).first():
+                if summary.get('type') == 'disambiguation':
+                    # Only the wikipedia package lists the options: it raises them
+                    wikipedia.page(title, auto_suggest=False)
                     continue
 
-                cats = validator.get_query_category(full)
-                keywords = ' '.join(text_processor.extract_main_keywords(full))
+                page_title = _summary_title(summary, title)
+                extract = summary.get('extract', '')
+                if not validator.is_african_query(f"{title} {extract}"):
+                    continue
 
-                new_content = Content(
-                    title=page.title,
-                    content=full_content[:100000],
-                    category=cats[0] if cats else 'general',
-                    keywords=keywords
-                )
-                db.session.add(new_content)
-                db.session.commit()
-                search_engine.index_content()
+                # The page can carry a normalized title we haven't checked yet
+                if page_title != title and db.session.query(Content.id).filter_by(title=page_title).scalar():
+                    continue
 
-                logger.info(f"Learned full: {page.title}")
+                # Answer from the summary now; the full article is fetched and
+                # stored off the request thread
+                _LEARN_POOL.submit(persist_and_index, page_title)
                 return {
-                    'response': f"**{page.title}**\n\n{page.summary[:1800]}...\n\n(Full details learned for deeper questions)",
+                    'response': f"**{page_title}**\n\n{extract[:1800]}...\n\n(Learning the full article for deeper questions)",
                     'source': 'Wikipedia (newly learned - full)',
                     'suggestions': results[1:6]
                 }
             except wikipedia.exceptions.DisambiguationError as e:
-                for opt in e.options[:3]:
-                    if validator.is_african_query(opt):
+                # Same as the main path: answer from the first new African option's
+                # summary and learn every new African option off the request thread
+                options = [opt for opt in e.options[:3] if _is_african_cached(opt.lower())]
+                known = {t for (t,) in db.session.query(Content.title).filter(Content.title.in_(options))}
+                answer = None
+                for opt in options:
+                    if opt in known:
+                        continue
+                    _LEARN_POOL.submit(persist_and_index, opt)
+                    if answer is None:
                         try:
-                            page = wikipedia.page(opt)
-                            full_content = page.content
-                            if Content.query.filter_by(title=page.title).first():
-                                continue
-                            new_content = Content(title=page.title, content=full_content[:100000],
-                                                category='general', keywords=opt.lower())
-                            db.session.add(new_content)
-                            db.session.commit()
-                            search_engine.index_content()
-                            return {
-                                'response': f"**{page.title}**\n\n{page.summary[:1800]}...",
-                                'source': 'Wikipedia',
-                                'suggestions': e.options[1:6]
-                            }
-                        except:
+                            summary = fetch_summary_fast(opt)
+                        except _WIKI_ERRORS as err:
+                            logger.debug(f"No summary for option {opt}: {err}")
                             continue
-            except:
+                        if summary and summary.get('type') != 'disambiguation':
+                            answer = (_summary_title(summary, opt), summary.get('extract', ''))
+                if answer:
+                    return {
+                        'response': f"**{answer[0]}**\n\n{answer[1][:1800]}...",
+                        'source': 'Wikipedia',
+                        'suggestions': e.options[1:6]
+                    }
+            except _WIKI_ERRORS as e:
+                db.session.rollback()
+                logger.debug(f"Skipping {title}: {e}")
                 continue
         return None
-    except:
+    except _WIKI_ERRORS as e:
+        db.session.rollback()
+        logger.debug(f"Wikipedia search failed for {query}: {e}")
         return None
 
 
@@ -707,42 +1141,19 @@ def chat_api():
         # 1. EXTRACT CURRENT TOPIC (IMPROVED)
         # =================================================================
         current_topic = None
+        # Decided once: whether to keep the previous topic, and whether to join it into the search query
+        is_follow_up, refines_topic = (
+            conversation_manager.follow_up_signals(query_lower) if recent else (False, False)
+        )
 
-        if recent:
+        if is_follow_up:
             last_exchange = recent[-1]
-            last_topic = last_exchange.topic
-            last_bot_response = last_exchange.bot_response
-
-            # Extract bold title and clean it up
-            if "**" in last_bot_response:
-                extracted = last_bot_response.split("**")[1].split("**")[0].strip()
-                
-                # IMPROVEMENT: Extract core subject (remove descriptive parts)
-                # "Death and state funeral of Nelson Mandela" → "Nelson Mandela"
-                # "History of Jollof Rice" → "Jollof Rice"
-                if extracted and len(extracted) > 2:
-                    # Remove common prefixes/suffixes
-                    for removal in [
-                        'death and state funeral of ', 'history of ', 'biography of ',
-                        'origin of ', 'story of ', 'life of ', 'legacy of ',
-                        ' recipe', ' history', ' biography'
-                    ]:
-                        extracted = extracted.lower().replace(removal, '').strip()
-                    
-                    last_topic = extracted.title()
-
-            # Strong follow-up indicators → keep previous topic
-            follow_up_indicators = [
-                'tell me more', 'more', 'detail', 'story', 'biography', 'yes', 'yeah',
-                'exactly', 'continue', 'another', 'next', 'also', 'too', 'what else',
-                'and ', 'so ', 'but ', 'that', 'this', 'he ', 'she ', 'it ',
-                'his ', 'her ', 'their ', 'him ', 'them ', 'education', 'life',
-                'childhood', 'early life', 'career', 'achievements'
-            ]
-            is_follow_up = any(ind in query_lower for ind in follow_up_indicators) or len(query_lower.split()) <= 10
-
-            if is_follow_up:
-                current_topic = last_topic
+            # core_topic is stored at save time; rows saved before it existed are parsed here
+            current_topic = (
+                last_exchange.core_topic
+                or conversation_manager.core_topic(last_exchange.bot_response)
+                or last_exchange.topic
+            )
 
         # Fallback
         current_topic = current_topic or "General"
@@ -753,17 +1164,19 @@ def chat_api():
         search_query = query
         
         # If it's a follow-up, combine topic + query
-        if conversation_manager.is_follow_up_question(query) and current_topic != "General":
+        if refines_topic and current_topic != "General":
             search_query = f"{current_topic} {query}"
 
         # =================================================================
         # 3. VALIDATION - CHECK ORIGINAL QUERY OR TOPIC (NOT COMBINED)
         # =================================================================
-        # IMPROVEMENT: If current topic is African, allow follow-ups
+        # IMPROVEMENT: If current topic is African, allow follow-ups.
+        # A follow-up that inherits an already-validated topic is valid as-is.
         is_valid_query = (
-            validator.is_african_query(query) or 
-            validator.is_african_query(search_query) or
-            (current_topic != "General" and validator.is_african_query(current_topic))
+            (is_follow_up and current_topic != "General" and recent[-1].topic_is_african) or
+            _is_african_cached(query.lower()) or 
+            _is_african_cached(search_query.lower()) or
+            (current_topic != "General" and _is_african_cached(current_topic.lower()))
         )
         
         if not is_valid_query:
@@ -808,7 +1221,9 @@ def chat_api():
         # =================================================================
         # 6. SAVE AND RETURN
         # =================================================================
-        conversation_manager.save_exchange(session_id, query, response_text, final_topic)
+        # Only a real topic is trusted later; a "General" turn passed on its query alone
+        conversation_manager.save_exchange(session_id, query, response_text, final_topic,
+                                           topic_is_african=final_topic != "General")
         
         return jsonify({
             'response': response_text,
@@ -821,13 +1236,22 @@ def chat_api():
         logger.error(f"Chat error: {e}", exc_info=True)
         return jsonify({'error': 'Something went wrong. Try again!'}), 500
 # === OTHER ROUTES (unchanged) ===
-@app.route('/health', methods=['GET'])
-def health():
+# Load balancers probe /health every second or so; hit the database at most
+# once per window
+HEALTH_CACHE_SECONDS = 2
+
+@lru_cache(maxsize=1)
+def _db_ping(_window):
     try:
-        db.session.execute('SELECT 1')
-        db_ok = True
+        with db.engine.connect() as conn:
+            conn.scalar(text('SELECT 1'))
+        return True
     except Exception:
-        db_ok = False
+        return False
+
+@app.route('/health', methods=['GET'])
+def health():
+    db_ok = _db_ping(int(time.monotonic() // HEALTH_CACHE_SECONDS))
     return jsonify({'status': 'ok', 'db': db_ok, 'time': datetime.utcnow().isoformat() + 'Z'}), 200 if db_ok else 500
 
 @app.route('/')
@@ -836,10 +1260,42 @@ def index():
 
 
 
+LIBRARY_PAGE_SIZE = 200
+
 @app.route('/library')
 def library():
-    contents = Content.query.order_by(Content.created_at.desc()).all()
-    return render_template('library.html', contents=contents)
+    page = max(request.args.get('page', 1, type=int), 1)
+    # Only what the cards show: a 151-char preview (the template truncates at
+    # 150 and adds '...') instead of each full document and its PDF text
+    rows = db.session.execute(
+        select(
+            Content.id, Content.title, Content.category, Content.created_at,
+            Content.keywords, Content.pdf_filename,
+            db.func.substr(Content.content, 1, 151).label('content')
+        )
+        .order_by(Content.created_at.desc())
+        .offset((page - 1) * LIBRARY_PAGE_SIZE)
+        .limit(LIBRARY_PAGE_SIZE + 1)
+    ).all()
+    has_next = len(rows) > LIBRARY_PAGE_SIZE
+    # Library-wide totals for the stats cards; the page itself only holds one slice
+    total_docs, pdf_docs = db.session.execute(
+        select(db.func.count(Content.id), db.func.count(Content.pdf_filename))
+    ).one()
+    return render_template('library.html', contents=rows[:LIBRARY_PAGE_SIZE], page=page, has_next=has_next,
+                           total_docs=total_docs, pdf_docs=pdf_docs)
+
+def extract_pdf_text(path, max_chars):
+    """Text of every page, stopping once max_chars have been read."""
+    parts, total = [], 0
+    with fitz.open(path) as doc:
+        for page in doc:
+            text_part = page.get_text("text")
+            parts.append(text_part)
+            total += len(text_part)
+            if total >= max_chars:
+                break
+    return "".join(parts)[:max_chars]
 
 @app.route('/upload', methods=['GET', 'POST'])
 def upload():
@@ -852,11 +1308,13 @@ def upload():
             filename = secure_filename(pdf.filename)
             path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             pdf.save(path)
-            pdf_text = fitz.open(path).load_page(0).get_text() if os.path.getsize(path) < 10*1024*1024 else ""
+            pdf_text = extract_pdf_text(path, app.config['MAX_INGEST_CHARS'])
 
         full_text = f"{title} {content_text} {pdf_text}"
         if not validator.is_african_query(full_text):
             return render_template('upload.html', error="Must be African/Black culture content")
+        if db.session.query(Content.id).filter(db.func.lower(Content.title) == title.lower()).first():
+            return render_template('upload.html', error="Content with this title already exists")
 
         new_content = Content(
             title=title,
@@ -868,29 +1326,91 @@ def upload():
         )
         db.session.add(new_content)
         db.session.commit()
-        search_engine.index_content()
         return redirect(url_for('library'))
     return render_template('upload.html')
 
 # === INIT ===
+def upgrade_schema():
+    """create_all() skips existing tables, so add newer columns and indexes to old databases."""
+    # IF NOT EXISTS rather than checkfirst: reflection can't see expression
+    # indexes such as lower(title), so checkfirst would try to recreate them.
+    with db.engine.begin() as conn:
+        # New columns are all nullable, so a plain ADD COLUMN is enough
+        for table in (Content.__table__, Conversation.__table__):
+            existing = {col['name'] for col in inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=conn.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+        # Superseded by composite indexes that lead with the same column:
+        # ix_content_cat_created and ix_conv_session_created
+        conn.execute(text('DROP INDEX IF EXISTS ix_content_category'))
+        conn.execute(text('DROP INDEX IF EXISTS ix_conversation_session_id'))
+        for table in (Content.__table__, Conversation.__table__):
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+SEED_TOPICS = ["Amapiano", "Jollof rice", "Kente cloth", "Kwame Nkrumah", "Fela Kuti", "Adinkra symbols", "Fufu", "Highlife", "Thomas Sankara"]
+WIKI_API_URL = "https://en.wikipedia.org/w/api.php"
+
+async def fetch_page(session, title):
+    """Fetch a page's resolved title and full plain-text extract in one API call."""
+    params = {
+        'action': 'query', 'prop': 'extracts', 'explaintext': 1, 'redirects': 1,
+        'titles': title, 'format': 'json'
+    }
+    async with session.get(WIKI_API_URL, params=params, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+        resp.raise_for_status()
+        data = await resp.json()
+    page = next(iter(data['query']['pages'].values()))
+    return page.get('title', title), page.get('extract') or ''
+
+async def _seed_all(topics):
+    async with aiohttp.ClientSession(headers={'User-Agent': 'AfricaChat/1.0'}) as session:
+        return await asyncio.gather(*(fetch_page(session, t) for t in topics), return_exceptions=True)
+
+def seed_content():
+    """Fetch all seed topics concurrently, then insert them in one commit."""
+    logger.info("Seeding initial African knowledge...")
+    rows, seen = [], set()
+    for topic, result in zip(SEED_TOPICS, asyncio.run(_seed_all(SEED_TOPICS))):
+        if isinstance(result, Exception):
+            logger.warning(f"Could not fetch seed topic {topic}: {result}")
+            continue
+        title, extract = result
+        if not extract or title in seen:
+            continue
+        seen.add(title)
+        rows.append(Content(
+            title=title,
+            content=extract[:100000],  # Full content for deeper
+            category='general',
+            keywords=topic.lower()
+        ))
+    db.session.bulk_save_objects(rows)
+    db.session.commit()
+    logger.info(f"Seeded {len(rows)} topics")
+
 with app.app_context():
     db.create_all()
-    if os.getenv('SEED_ON_START', 'false').lower() == 'true' and Content.query.count() == 0 and check_internet_connection():
-        logger.info("Seeding initial African knowledge...")
-        for topic in ["Amapiano", "Jollof rice", "Kente cloth", "Kwame Nkrumah", "Fela Kuti", "Adinkra symbols", "Fufu", "Highlife", "Thomas Sankara"]:
-            try:
-                page = wikipedia.page(topic)
-                db.session.add(Content(
-                    title=page.title,
-                    content=page.content[:100000],  # Full content for deeper
-                    category='general',
-                    keywords=topic.lower()
-                ))
-            except:
-                pass
-        db.session.commit()
-    search_engine.index_content()
+    upgrade_schema()
+    if os.getenv('SEED_ON_START', 'false').lower() == 'true':
+        # Any row at all means the library was seeded (or filled) before
+        library_empty = db.session.query(Content.id).limit(1).scalar() is None
+        if library_empty and check_internet_connection():
+            seed_content()
+    # Rows written before content_fts existed (seeding included) are picked up
+    # by the rebuild that runs when it's first created
+    search_engine.index_content(rebuild=False)
     logger.info("Sankofa AI Ready!")
+    # Init runs once in the Gunicorn master under --preload; drop its pooled
+    # connections so forked workers open their own instead of sharing them.
+    db.engine.dispose()
+
+@atexit.register
+def _flush_search_counts():
+    with app.app_context():
+        search_engine.flush_search_counts()
 
 if __name__ == '__main__':
     host = os.getenv('HOST', '0.0.0.0')
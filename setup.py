@@ -28,7 +28,7 @@ def check_dependencies():
     """Check if all required packages are installed"""
     required_packages = [
         'flask', 'flask_sqlalchemy', 'flask_admin',
-        'pandas', 'sklearn', 'nltk', 'fitz', 'wikipedia'
+        'pandas', 'sklearn', 'nltk', 'fitz', 'wikipedia', 'ahocorasick'
     ]
     
     missing_packages = []